@@ -13,7 +13,6 @@ from collections.abc import Callable
 from pathlib import Path
 from typing import Any
 
-import yaml
 from mido import MidiFile
 
 from .draft import Draft, DraftSettings, find_available_filename
@@ -187,9 +186,16 @@ def generate_draft(source_path: str | Path,
         settings: DraftSettings = DraftSettings(**kwargs)
     else:
         with open(settings_path, 'rb') as fp:
-            obj: dict[str, Any] = yaml.safe_load(fp)
-        obj.update(kwargs)
-        settings = DraftSettings.model_validate(obj)
+            yaml_data: bytes = fp.read()
+        if kwargs:
+            import yaml
+
+            obj: dict[str, Any] = yaml.safe_load(yaml_data)
+            obj.update(kwargs)
+            settings = DraftSettings.model_validate(obj)
+        else:
+            # 批量生成稿纸时反复读取同一份设置文件，内容相同时直接使用缓存的解析结果
+            settings = DraftSettings.model_validate_yaml(yaml_data)
 
     # if note_count is not None and note_count not in music_box_presets:
     #     raise ValueError(f'{note_count} note music box not in presets.')
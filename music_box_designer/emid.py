@@ -1,9 +1,9 @@
 import math
 from dataclasses import dataclass, field
+from operator import attrgetter, itemgetter
 from pathlib import Path
-from typing import Self, TextIO
+from typing import NamedTuple, Self, TextIO
 
-import mido.midifiles.tracks
 from mido import Message, MetaMessage, MidiFile, MidiTrack, bpm2tempo
 
 from .consts import DEFAULT_DURATION, MIDI_DEFAULT_TICKS_PER_BEAT
@@ -13,10 +13,11 @@ EMID_TICKS_PER_BEAT = 8
 EMID_PITCHES: list[int] = [93, 91, 89, 88, 87, 86, 85, 84, 83, 82,
                            81, 80, 79, 78, 77, 76, 75, 74, 73, 72,
                            71, 70, 69, 67, 65, 64, 62, 60, 55, 53]
+EMID_PITCH_INDICES: dict[int, int] = {pitch: index for index, pitch in enumerate(EMID_PITCHES)}
+'''MIDI 音高到 emid 音高序号的映射，查找音高时不必逐个比较 `EMID_PITCHES`'''
 
 
-@dataclass(frozen=True)
-class EmidNote:
+class EmidNote(NamedTuple):
     emid_pitch: int
     '''音高'''
     tick: int
@@ -44,19 +45,14 @@ class EmidFile:
         length = int(length_str)
         note_str_list: list[str] = notes_str.split('#')
         track_name_list: list[str] = track_name_str.split(',')
-        track_name_dict: dict[str, int] = {k: v for v, k in enumerate(track_name_list)}
         # 添加空轨道
-        tracks: list[EmidTrack] = []
-        for track_name in track_name_list:
-            new_track = EmidTrack(track_name)
-            tracks.append(new_track)
+        tracks: list[EmidTrack] = [EmidTrack(track_name) for track_name in track_name_list]
+        # 按轨道名直接取到音符列表，重名时与原先一样归入最后一个同名轨道
+        track_notes_dict: dict[str, list[EmidNote]] = {track.name: track.notes for track in tracks}
         # 添加音符
         for note_str in note_str_list:
             emid_pitch_str, tick_str, track_name = note_str.split(',')
-            emid_pitch = int(emid_pitch_str)
-            tick = int(tick_str)
-            track_index: int = track_name_dict[track_name]
-            tracks[track_index].notes.append(EmidNote(emid_pitch, tick))
+            track_notes_dict[track_name].append(EmidNote(int(emid_pitch_str), int(tick_str)))
         return cls(tracks, length)
 
     @classmethod
@@ -79,11 +75,12 @@ class EmidFile:
         return self
 
     def to_str(self) -> str:
-        note_str: str = '#'.join(
-            f'{note.emid_pitch},{note.tick},{track.name}'
-            for track in self.tracks
-            for note in track.notes
-        )
+        # 先收集为列表再拼接，str.join 对列表只需遍历一次；轨道名部分每个轨道只格式化一次
+        note_strs: list[str] = []
+        for track in self.tracks:
+            track_name_suffix: str = f',{track.name}'
+            note_strs.extend([f'{emid_pitch},{tick}{track_name_suffix}' for emid_pitch, tick in track.notes])
+        note_str: str = '#'.join(note_strs)
         track_names_str: str = ','.join(track.name for track in self.tracks)
         return f'{note_str}&{self.length}*{track_names_str}'
 
@@ -112,12 +109,12 @@ class EmidFile:
             for message in midi_track:
                 midi_tick += message.time
                 if message.type == 'note_on' and message.velocity > 0:
-                    if message.note + transposition not in EMID_PITCHES:
+                    emid_pitch: int | None = EMID_PITCH_INDICES.get(message.note + transposition)
+                    if emid_pitch is None:
                         logger.warning(f'note {message.note + transposition} out of range!')
                         continue
                     tick: int = round(midi_tick / midi_file.ticks_per_beat * EMID_TICKS_PER_BEAT)
-                    emid_track.notes.append(EmidNote(
-                        EMID_PITCHES.index(message.note + transposition), tick))
+                    emid_track.notes.append(EmidNote(emid_pitch, tick))
             if emid_track.notes:
                 emid_track.name = str(len(emid_file.tracks))
                 emid_file.tracks.append(emid_track)
@@ -144,22 +141,20 @@ class EmidFile:
             # midi_track.append(MetaMessage(type='track_name', name=f'Track {track.name}', time=0))
             midi_track.name = f'Track {track.name}'
             midi_track.append(Message(type='program_change', program=10, time=0))
-            for note in sorted(track.notes, key=lambda note: note.tick):
-                if EMID_PITCHES[note.emid_pitch] + transposition not in range(128):
+            # 与 Draft.export_midi 相同，先排序音符事件，再直接以相对时间构造消息
+            events: list[tuple[int, str, int]] = []
+            for note in sorted(track.notes, key=attrgetter('tick')):
+                pitch: int = EMID_PITCHES[note.emid_pitch] + transposition
+                if pitch not in range(128):
                     continue
-
-                midi_track.append(Message(
-                    type='note_on',
-                    note=EMID_PITCHES[note.emid_pitch] + transposition,
-                    time=round(note.tick / EMID_TICKS_PER_BEAT * ticks_per_beat)
-                ))
-                midi_track.append(Message(
-                    type='note_off',
-                    note=EMID_PITCHES[note.emid_pitch] + transposition,
-                    time=round((note.tick / EMID_TICKS_PER_BEAT + DEFAULT_DURATION) * ticks_per_beat)
-                ))
-            midi_track.sort(key=lambda message: message.time)
-            midi_file.tracks.append(MidiTrack(mido.midifiles.tracks._to_reltime(midi_track)))
+                events.append((round(note.tick / EMID_TICKS_PER_BEAT * ticks_per_beat), 'note_on', pitch))
+                events.append((round((note.tick / EMID_TICKS_PER_BEAT + DEFAULT_DURATION) * ticks_per_beat), 'note_off', pitch))
+            events.sort(key=itemgetter(0))
+            last_midi_tick: int = 0
+            for midi_tick, message_type, pitch in events:
+                midi_track.append(Message(type=message_type, note=pitch, time=midi_tick - last_midi_tick))
+                last_midi_tick = midi_tick
+            midi_file.tracks.append(midi_track)
 
         for midi_track in midi_file.tracks:
             midi_track.append(MetaMessage(type='end_of_track', time=0))
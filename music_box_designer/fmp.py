@@ -3,6 +3,7 @@ import struct
 from collections import defaultdict
 from dataclasses import dataclass, field
 from io import BytesIO
+from operator import attrgetter, itemgetter
 from pathlib import Path
 from typing import Annotated, Any, BinaryIO, ClassVar, Literal, NamedTuple, Self, override
 
@@ -15,6 +16,12 @@ from .consts import MIDI_DEFAULT_TICKS_PER_BEAT
 from .log import logger
 
 FMP_DEFAULT_TICKS_PER_BEAT = 96
+FMP_NOTE_STRUCT = struct.Struct('<2sIBIB')
+'''音符的二进制格式：2 字节的固定头部 `b'\\x10\\x00'`，以及刻数、音高、持续时间、力度'''
+MIDI_VELOCITIES: list[int] = [round(velocity / 255 * 127) for velocity in range(256)]
+'''FMP 力度（0~255）对应的 MIDI 力度（0~127）'''
+FMP_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ': '))
+'''FMP 中 JSON 配置的格式（冒号后带空格）。复用同一个编码器，避免每次 `json.dumps` 都重新构造'''
 
 
 class TimeSignature(NamedTuple):
@@ -22,7 +29,7 @@ class TimeSignature(NamedTuple):
     denominator: int = 4
 
 
-@dataclass
+@dataclass(slots=True)  # 音符数量可能很多，不为每个音符创建 __dict__，节省内存并加快属性访问
 class FmpNote:
     pitch: int
     '''音高'''
@@ -44,9 +51,11 @@ class FmpTrack:
     notes: list[FmpNote] = field(default_factory=lambda: [])
 
     def transpose(self, transposition: int) -> None:
+        # 转调后仍在 range(128) 内的原音高范围，只构造一次
+        pitches: range = range(-transposition, 128 - transposition)
         self.notes = [note.__class__(note.pitch + transposition, note.tick, note.duration, note.velocity)
                       for note in self.notes
-                      if note.pitch + transposition in range(128)]
+                      if note.pitch in pitches]
 
     def set_velocity(self, velocity: int) -> None:
         if not 0 <= velocity <= 255:
@@ -83,11 +92,7 @@ class FmpModel(BaseModel):
 
     @override
     def model_dump_json(self, mode='json', by_alias=True, **kwargs) -> str:
-        return json.dumps(
-            self.model_dump(mode=mode, by_alias=by_alias, **kwargs),
-            ensure_ascii=False,
-            separators=(',', ': '),
-        )
+        return FMP_JSON_ENCODER.encode(self.model_dump(mode=mode, by_alias=by_alias, **kwargs))
 
 
 def float_to_str(x: float) -> str:
@@ -415,8 +420,9 @@ class FmpFile:
     @classmethod
     def open(cls, file: str | Path | BinaryIO) -> Self:
         if isinstance(file, (str, Path)):
-            with open(file, 'rb') as fp:
-                self: Self = cls._load_from_file(fp)
+            # 一次性读入内存再解析，避免逐个字段读取时反复经过文件缓冲层
+            with open(file, 'rb') as fp, BytesIO(fp.read()) as bytes_io:
+                self: Self = cls._load_from_file(bytes_io)
             self.file_path = Path(file)
         else:
             self = cls._load_from_file(file)
@@ -504,14 +510,12 @@ class FmpFile:
             assert file.read(4) == b'\x01\x00\x01\x0A'
 
             # 音符
-            for _ in range(note_count):
-                assert file.read(2) == b'\x10\x00'
-                tick: int = read_int(file, 4)
-                pitch: int = read_int(file, 1)
-                duration: int = read_int(file, 4)
-                velocity: int = read_int(file, 1)
-                note = FmpNote(pitch, tick, duration, velocity)
-                track.notes.append(note)
+            # 每个音符都是定长的 12 字节，一次读出整个音符块再用 Struct 逐条解包，不再逐个字段读取
+            note_block: bytes = file.read(note_count * FMP_NOTE_STRUCT.size)
+            assert len(note_block) == note_count * FMP_NOTE_STRUCT.size
+            for note_header, tick, pitch, duration, velocity in FMP_NOTE_STRUCT.iter_unpack(note_block):
+                assert note_header == b'\x10\x00'
+                track.notes.append(FmpNote(pitch, tick, duration, velocity))
 
             fmp_file.tracks.append(track)
 
@@ -690,8 +694,9 @@ class FmpFile:
             write_int(file, self.scale, 4)
             write_int(file, self.ticks_per_beat, 2)
             file.write(bytes(4))
-            write_int(file, len(self.instrument.encode()), 2)
-            file.write(self.instrument.encode())
+            instrument_bytes: bytes = self.instrument.encode()
+            write_int(file, len(instrument_bytes), 2)
+            file.write(instrument_bytes)
             file.write(b'\x03\x00\x00\x00')
 
         num: int = (
@@ -703,43 +708,49 @@ class FmpFile:
         )
         write_int(file, num, 4)
         if self.note is not None:
+            note_bytes: bytes = self.note.encode()
             write_int(file, 4, 1)
-            write_int(file, len(self.note.encode()), 3)
+            write_int(file, len(note_bytes), 3)
             file.write(b'note')
-            file.write(self.note.encode())
+            file.write(note_bytes)
         if self.show_info_on_open is not None:
             write_int(file, 3, 1)
             write_int(file, 1, 3)
             file.write(b'sio')
             write_bool(file, self.show_info_on_open)
         if self.title is not None:
+            title_bytes: bytes = self.title.encode()
             write_int(file, 2, 1)
-            write_int(file, len(self.title.encode()) + 1, 3)
+            write_int(file, len(title_bytes) + 1, 3)
             file.write(b'ti')
-            file.write(self.title.encode())
+            file.write(title_bytes)
             file.write(bytes(1))
         if self.subtitle is not None:
+            subtitle_bytes: bytes = self.subtitle.encode()
             write_int(file, 3, 1)
-            write_int(file, len(self.subtitle.encode()) + 1, 3)
+            write_int(file, len(subtitle_bytes) + 1, 3)
             file.write(b'sti')
-            file.write(self.subtitle.encode())
+            file.write(subtitle_bytes)
             file.write(bytes(1))
         if self.comment is not None:
+            comment_bytes: bytes = self.comment.encode()
             write_int(file, 3, 1)
-            write_int(file, len(self.comment.encode()) + 1, 3)
+            write_int(file, len(comment_bytes) + 1, 3)
             file.write(b'cmt')
-            file.write(self.comment.encode())
+            file.write(comment_bytes)
             file.write(bytes(1))
 
         file.write(b'TRK')
         with LengthWriter(file, 0, 4):
             write_int(file, len(self.tracks), 4)
             for track in self.tracks:
+                # 轨道名只编码一次；各长度字段都按编码后的字节数计算，与读取时的校验一致
+                track_name_bytes: bytes = track.name.encode()
                 file.write(b'\x01')
-                write_int(file, len(track.notes) * 12 + len(track.name) + 39, 4)
-                write_int(file, len(track.name.encode()) + 19, 4)
-                write_int(file, len(track.name.encode()), 2)
-                file.write(track.name.encode())
+                write_int(file, len(track.notes) * 12 + len(track_name_bytes) + 39, 4)
+                write_int(file, len(track_name_bytes) + 19, 4)
+                write_int(file, len(track_name_bytes), 2)
+                file.write(track_name_bytes)
                 write_int(file, track.channel, 4)
                 write_int(file, track.index, 4)
                 write_int(file, track.color, 4)
@@ -748,12 +759,9 @@ class FmpFile:
                 write_int(file, len(track.notes) * 12 + 12, 4)
                 write_int(file, len(track.notes), 4)
                 file.write(b'\x01\x00\x01\x0A')
-                for note in track.notes:
-                    file.write(b'\x10\x00')
-                    write_int(file, note.tick, 4)
-                    write_int(file, note.pitch, 1)
-                    write_int(file, note.duration, 4)
-                    write_int(file, note.velocity, 1)
+                # 与读取时相同，音符块按定长记录一次打包，整块只写入一次
+                file.write(b''.join([FMP_NOTE_STRUCT.pack(b'\x10\x00', note.tick, note.pitch, note.duration, note.velocity)
+                                     for note in track.notes]))
 
         file.write(b'TMK')
         with LengthWriter(file, 0, 4):
@@ -769,11 +777,12 @@ class FmpFile:
                     write_int(file, time_mark.time_signature.numerator, 2)
                     write_int(file, time_mark.time_signature.denominator, 2)
                 elif isinstance(time_mark, FmpCommentMark):
+                    time_mark_comment_bytes: bytes = time_mark.comment.encode()
                     write_int(file, 2, 1)
-                    write_int(file, len(time_mark.comment.encode()) + 6, 2)
+                    write_int(file, len(time_mark_comment_bytes) + 6, 2)
                     write_int(file, time_mark.tick, 4)
-                    write_int(file, len(time_mark.comment.encode()), 2)
-                    file.write(time_mark.comment.encode())
+                    write_int(file, len(time_mark_comment_bytes), 2)
+                    file.write(time_mark_comment_bytes)
                 elif isinstance(time_mark, FmpEndMark):
                     write_int(file, 3, 1)
                     write_int(file, 4, 2)
@@ -797,9 +806,10 @@ class FmpFile:
                     write_int(file, channel.pan, 2)
                     write_bool(file, channel.solo)
                     write_bool(file, channel.muted)
-                    write_int(file, len(channel.soundfont_name.encode()), 2)
+                    soundfont_name_bytes: bytes = channel.soundfont_name.encode()
+                    write_int(file, len(soundfont_name_bytes), 2)
                     # write_int(file, len(soundfont_name.encode()), 2)
-                    file.write(channel.soundfont_name.encode())
+                    file.write(soundfont_name_bytes)
                     # file.write(soundfont_name.encode())
                     write_int(file, channel.soundfont_index, 4)
 
@@ -834,8 +844,9 @@ class FmpFile:
                 with LengthWriter(file, 0, 4):
                     write_int(file, len(channel.effectors), 4)
                     for effector in channel.effectors:
-                        write_int(file, len(effector.effector_name.encode()), 2)
-                        file.write(effector.effector_name.encode())
+                        effector_name_bytes: bytes = effector.effector_name.encode()
+                        write_int(file, len(effector_name_bytes), 2)
+                        file.write(effector_name_bytes)
                         write_bool(file, effector.enabled)
                         write_float(file, effector.mix_level, 4)
                         bytes_data = effector.effect_values.model_dump_json().encode()
@@ -850,10 +861,11 @@ class FmpFile:
         )
         write_int(file, num, 4)
         if self.ignore_issues is not None:
+            ignore_issues_bytes: bytes = self.ignore_issues.encode()
             write_int(file, 13, 1)
-            write_int(file, len(self.ignore_issues.encode()), 3)
+            write_int(file, len(ignore_issues_bytes), 3)
             file.write(b'ignore_issues')
-            file.write(self.ignore_issues.encode())
+            file.write(ignore_issues_bytes)
         if self.instrument_cfg is not None:
             write_int(file, 14, 1)
             bytes_data: bytes = self.instrument_cfg.model_dump_json().encode()
@@ -870,7 +882,7 @@ class FmpFile:
             file.write(bytes(1))
         if self.dgstyle_cfg is not None:
             write_int(file, 11, 1)
-            bytes_data: bytes = json.dumps(self.dgstyle_cfg, ensure_ascii=False, separators=(',', ': ')).encode()
+            bytes_data: bytes = FMP_JSON_ENCODER.encode(self.dgstyle_cfg).encode()
             write_int(file, len(bytes_data) + 1, 3)
             file.write(b'dgstyle_cfg')
             file.write(bytes_data)
@@ -997,7 +1009,7 @@ class FmpFile:
                     fmp_track.notes.append(note)
 
             if fmp_track.notes:
-                # fmp_track.notes.sort(key=lambda note: (note.tick, note.pitch))
+                # fmp_track.notes.sort(key=attrgetter('tick', 'pitch'))
                 fmp_track.index = len(new_tracks) + 1 if override else len(self.tracks) + len(new_tracks) + 1
                 new_tracks.append(fmp_track)
 
@@ -1007,7 +1019,7 @@ class FmpFile:
         else:
             self.tracks.extend(new_tracks)
             self.time_marks.extend(new_time_marks)
-        self.time_marks.sort(key=lambda time_mark: time_mark.tick)
+        self.time_marks.sort(key=attrgetter('tick'))
 
         return self
 
@@ -1023,6 +1035,8 @@ class FmpFile:
         if apply_instrument_transposition:
             transposition += int(self.get_instrument_cfg().transpose)
         scale: float = self.scale / 100000 if apply_scale else 1
+        # 转调后仍在 range(128) 内的原音高范围
+        pitches: range = range(-transposition, 128 - transposition)
 
         time_signature_track = MidiTrack()
         tempo_track = MidiTrack()
@@ -1063,24 +1077,21 @@ class FmpFile:
             midi_track.name = track.name
             midi_track.append(Message(type='program_change', program=10, time=0))
 
-            for note in sorted(track.notes, key=lambda note: note.tick):
+            # 与 Draft.export_midi 相同，先排序音符事件，再直接以相对时间构造消息；note_off 使用 mido 默认的力度 64
+            events: list[tuple[int, str, int, int]] = []
+            for note in sorted(track.notes, key=attrgetter('tick')):
                 pitch: int = note.pitch + transposition
-                if pitch not in range(128):
-                    logger.warning(f'Note {note.pitch} out of range(128), SKIPPING!')
+                if note.pitch not in pitches:
+                    logger.warning(f'Note {pitch} out of range(128), SKIPPING!')
                     continue
-                midi_track.append(Message(
-                    type='note_on',
-                    note=pitch,
-                    velocity=round(note.velocity / 255 * 127),
-                    time=round(note.tick / self.ticks_per_beat * scale * ticks_per_beat),
-                ))
-                midi_track.append(Message(
-                    type='note_off',
-                    note=pitch,
-                    time=round((note.tick + note.duration) / self.ticks_per_beat * scale * ticks_per_beat),
-                ))
-            midi_track.sort(key=lambda msg: msg.time)
-            midi_file.tracks.append(MidiTrack(mido.midifiles.tracks._to_reltime(midi_track)))
+                events.append((round(note.tick / self.ticks_per_beat * scale * ticks_per_beat), 'note_on', pitch, MIDI_VELOCITIES[note.velocity]))
+                events.append((round((note.tick + note.duration) / self.ticks_per_beat * scale * ticks_per_beat), 'note_off', pitch, 64))
+            events.sort(key=itemgetter(0))
+            last_midi_tick: int = 0
+            for midi_tick, message_type, pitch, velocity in events:
+                midi_track.append(Message(type=message_type, note=pitch, velocity=velocity, time=midi_tick - last_midi_tick))
+                last_midi_tick = midi_tick
+            midi_file.tracks.append(midi_track)
 
         for midi_track in midi_file.tracks:
             midi_track.append(MetaMessage(type='end_of_track', time=0))
@@ -1104,10 +1115,16 @@ def read_bool(file: BinaryIO, /) -> bool:
     return bool(i)
 
 
+FLOAT_STRUCTS: dict[tuple[int, str], struct.Struct] = {
+    (byte, byteorder): struct.Struct(f'{byteorder_flag}{format_character}')
+    for byte, format_character in ((2, 'e'), (4, 'f'), (8, 'd'))
+    for byteorder, byteorder_flag in (('big', '>'), ('little', '<'))
+}
+'''按 (字节数, 字节序) 预先编译的浮点数格式，读写时不必每次拼接并解析格式字符串'''
+
+
 def read_float(file: BinaryIO, /, byte: Literal[2, 4, 8] = 4, byteorder: Literal['big', 'little'] = 'little') -> float:
-    byteorder_flag = {'big': '>', 'little': '<'}[byteorder]
-    format_character = {2: 'e', 4: 'f', 8: 'd'}[byte]
-    return struct.unpack(f'{byteorder_flag}{format_character}', file.read(byte))[0]
+    return FLOAT_STRUCTS[byte, byteorder].unpack(file.read(byte))[0]
 
 
 def write_int(file: BinaryIO,
@@ -1130,9 +1147,7 @@ def write_float(file: BinaryIO,
                 value: float,
                 byte: Literal[2, 4, 8] = 4,
                 byteorder: Literal['big', 'little'] = 'little') -> None:
-    byteorder_flag = {'big': '>', 'little': '<'}[byteorder]
-    format_character = {2: 'e', 4: 'f', 8: 'd'}[byte]
-    file.write(struct.pack(f'{byteorder_flag}{format_character}', value))
+    file.write(FLOAT_STRUCTS[byte, byteorder].pack(value))
 
 
 class LengthWriter:
@@ -6,10 +6,10 @@ from collections.abc import Generator, Iterable
 from dataclasses import dataclass, field
 from io import BytesIO
 from itertools import pairwise
+from operator import attrgetter, itemgetter
 from pathlib import Path
 from typing import NamedTuple, Self, TextIO
 
-import mido
 from PIL import Image, ImageDraw
 from mido import Message, MidiFile, MidiTrack
 
@@ -63,7 +63,7 @@ def _get_note_lines(notes: list[MCodeNote]) -> list[_NoteLine]:
 
 def get_arranged_notes(notes: list[MCodeNote], ppq: int = DEFAULT_PPQ) -> list[MCodeNote]:
     # Do we have an algorithm which uses O(1) extra space?
-    notes = sorted(notes, key=lambda note: (note.tick, note.pitch_index))
+    notes = sorted(notes, key=attrgetter('tick', 'pitch_index'))
     note_lines: list[_NoteLine] = _get_note_lines(notes)
 
     distance_positive: float = 0  # Positive means from lowest to highest
@@ -205,9 +205,8 @@ class MCodeFile:
             for message in track:
                 midi_tick += message.time
                 if message.type == 'note_on' and message.velocity > 0:
-                    try:
-                        pitch_index: int = music_box_30_notes.range.index(message.note + transposition)
-                    except ValueError:
+                    pitch_index: int | None = music_box_30_notes.pitch_indices.get(message.note + transposition)
+                    if pitch_index is None:
                         logger.warning(f'Note {message.note + transposition} is not in the range of the music box.')
                         continue
                     notes.append(MCodeNote(pitch_index + 1,
@@ -253,20 +252,21 @@ class MCodeFile:
                 midi_file = MidiFile(file=BytesIO(bytes_data))
                 return midi_file
 
+        # 与 Draft.export_midi 相同，先排序音符事件，再直接以相对时间构造消息
+        events: list[tuple[int, str, int]] = []
         for pitch_index, tick in messages_to_notes(self.messages):
             pitch = music_box_30_notes.range[pitch_index - 1] + transposition
             if pitch not in range(128):
                 logger.warning(f'Note {pitch} is not in range(128).')
                 continue
-            midi_track.append(Message('note_on',
-                                      note=pitch,
-                                      velocity=64,
-                                      time=round(tick / self.ppq * ticks_per_beat)))
-            midi_track.append(Message('note_off',
-                                      note=pitch,
-                                      time=round(((tick / self.ppq) + DEFAULT_DURATION) * ticks_per_beat)))
-        midi_track.sort(key=lambda message: message.time)
-        midi_file.tracks.append(MidiTrack(mido.midifiles.tracks._to_reltime(midi_track)))
+            events.append((round(tick / self.ppq * ticks_per_beat), 'note_on', pitch))
+            events.append((round(((tick / self.ppq) + DEFAULT_DURATION) * ticks_per_beat), 'note_off', pitch))
+        events.sort(key=itemgetter(0))
+        last_midi_tick: int = 0
+        for midi_tick, message_type, pitch in events:
+            midi_track.append(Message(message_type, note=pitch, velocity=64, time=midi_tick - last_midi_tick))
+            last_midi_tick = midi_tick
+        midi_file.tracks.append(midi_track)
 
         return midi_file
 
@@ -277,27 +277,21 @@ class MCodeFile:
         tick: int = notes[-1].tick if notes else 0
         length: float = tick / self.ppq * music_box_30_notes.length_mm_per_beat
         image_size: tuple[int, int] = pos_mm_to_pixel((music_box_30_notes.col_width, length), ppi, 'round')
-        image: Image.Image = Image.new('RGBA', image_size, 'white')
+        image: Image.Image = Image.new('RGB', image_size, 'white')  # 背景不透明，不需要透明度通道
         draw: ImageDraw.ImageDraw = ImageDraw.Draw(image)
-        for index, tick in notes:
-            draw_circle(
-                image,
-                pos_mm_to_pixel((music_box_30_notes.left_border + index * music_box_30_notes.grid_width,
-                                 tick / self.ppq * music_box_30_notes.length_mm_per_beat),
-                                ppi, 'round'),
-                mm_to_pixel(1, ppi), 'black',
-            )
-        for (index0, tick0), (index1, tick1) in pairwise(notes):
-            draw.line(
-                (pos_mm_to_pixel((music_box_30_notes.left_border + index0 * music_box_30_notes.grid_width,
-                                  tick0 / self.ppq * music_box_30_notes.length_mm_per_beat),
-                                 ppi, 'round'),
-                 pos_mm_to_pixel((music_box_30_notes.left_border + index1 * music_box_30_notes.grid_width,
-                                  tick1 / self.ppq * music_box_30_notes.length_mm_per_beat),
-                                 ppi, 'round')),
-                'black',
-                round(mm_to_pixel(0.5, ppi)),
-            )
+        # 每个音符的像素坐标只换算一次，画圆和连线时共用
+        positions: list[tuple[int, int]] = [
+            pos_mm_to_pixel((music_box_30_notes.left_border + index * music_box_30_notes.grid_width,
+                             tick / self.ppq * music_box_30_notes.length_mm_per_beat),
+                            ppi, 'round')
+            for index, tick in notes
+        ]
+        radius: float = mm_to_pixel(1, ppi)
+        for position in positions:
+            draw_circle(image, position, radius, 'black')
+        line_width: int = round(mm_to_pixel(0.5, ppi))
+        for line in pairwise(positions):
+            draw.line(line, 'black', line_width)
         return image
 
     def iter_lines(self) -> Generator[str, None, None]:
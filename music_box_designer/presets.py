@@ -13,12 +13,16 @@ class MusicBox:
     length_mm_per_beat: float = 8
 
     col_width: float = field(init=False)
+    pitch_indices: dict[int, int] = field(init=False, repr=False, compare=False)
+    '''音高到其在 `range` 中序号的映射，与 `range.index` 一致，重复的音高取第一个序号'''
 
     def __post_init__(self) -> None:
         if len(self.range) != self.note_count:
             raise ValueError('The length of range must be equal to notes.')
         object.__setattr__(self, 'col_width',
                            self.left_border + self.grid_width * (self.note_count - 1) + self.right_border)
+        object.__setattr__(self, 'pitch_indices',
+                           {pitch: index for index, pitch in reversed(list(enumerate(self.range)))})
 
 
 music_box_30_notes = MusicBox(
@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import pytest
+from PIL import Image, ImageChops
+
+from music_box_designer.draft import Draft, DraftSettings
+
+ROOT: Path = Path(__file__).parent.parent
+
+
+@pytest.fixture(autouse=True)
+def chdir_to_root(monkeypatch: pytest.MonkeyPatch) -> None:
+    # 设置中的字体等路径相对于仓库根目录
+    monkeypatch.chdir(ROOT)
+
+
+@pytest.mark.parametrize('ppi, note_radius', [
+    (150, 1.1),  # 所有音符共用同一个图像
+    (254, 0.65),  # 半径恰为 6.5 像素，逐个绘制
+])
+@pytest.mark.parametrize('background', ['#123456', 'image'])
+def test_translucent_overwrite_does_not_depend_on_background_opacity(ppi: float, note_radius: float, background: str) -> None:
+    '''不抗锯齿的半透明音符和半透明网格线覆盖已有内容，不透明背景上直接绘制的结果与透明图层合成到背景上的结果一致'''
+    kwargs = dict(
+        anti_alias='off',
+        ppi=ppi,
+        note_radius=note_radius,
+        note_color='#ff000080',
+        whole_beat_line_color='#0000ff80',
+        half_beat_line_color='#00ff0080',
+        vertical_line_color='#00000080',
+        column_info_color='black',
+        show_note_path=True,
+    )
+    if background == 'image':
+        background_image: Image.Image = Image.radial_gradient('L').convert('RGB').resize((300, 400))
+    else:
+        background_image = Image.new('RGB', (1, 1), background)
+    draft: Draft = Draft.load_from_file('examples/example.mid')
+    opaque_pages = draft.export_pics(settings=DraftSettings(background=background_image if background == 'image' else background,
+                                                            **kwargs))
+    layer_pages = draft.export_pics(settings=DraftSettings(background='#00000000', **kwargs))
+
+    assert len(opaque_pages) == len(layer_pages)
+    for opaque_page, layer_page in zip(opaque_pages, layer_pages):
+        expected: Image.Image = Image.alpha_composite(background_image.convert('RGBA').resize(layer_page.size), layer_page)
+        difference: Image.Image = ImageChops.difference(opaque_page.convert('RGB'), expected.convert('RGB'))
+        assert max(high for _, high in difference.getextrema()) == 0